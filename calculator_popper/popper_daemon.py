@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import runpy
+import importlib
+import traceback
+
+# =======================
+# ✅ PERSISTENT POPPER WORKER
+# =======================
+# Started by run.py as: python -u popper_daemon.py <path/to/popper.py>
+# Prints READY once Popper is imported, then reads one JSON request per line
+# ({"work_dir": ...}) from stdin, runs Popper on it and prints SENTINEL when done.
+# Popper's Prolog-free modules and their heavy dependencies (clingo, pysat, bitarray,
+# pkg_resources) are imported once; every run happens in a forked child so no state
+# leaks between runs.
+READY = "---READY---"
+SENTINEL = "---END---"
+
+# popper.loop / popper.tester are left out on purpose: they import janus_swi, which boots
+# an embedded SWI-Prolog that is not safe to fork. Each child loads them itself.
+PRELOAD_MODULES = [
+    "popper.util",
+    "popper.bkcons",
+    "popper.combine",
+    "popper.generate",
+    "popper.gen2",
+    "popper.gen3",
+]
+
+def preload_popper(popper_path):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(popper_path)))
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+def run_job(popper_path, work_dir):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            sys.argv = [popper_path, work_dir]
+            runpy.run_path(popper_path, run_name="__main__")
+        except SystemExit as e:
+            # Same mapping as the interpreter: None -> 0, int as is, anything else is printed -> 1
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    os.waitpid(pid, 0)
+
+def main():
+    popper_path = sys.argv[1]
+    preload_popper(popper_path)
+    print(READY, flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            run_job(popper_path, request["work_dir"])
+        except Exception:
+            traceback.print_exc()
+        print(SENTINEL, flush=True)
+
+if __name__ == "__main__":
+    main()
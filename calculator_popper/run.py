@@ -31,32 +31,40 @@ def ensure_tkinter_before_import():
             print("[FATAL] Tkinter is still unavailable. Exiting.")
             sys.exit(1)
 
-ensure_tkinter_before_import()
-
-# ✅ Safe to import now
+# ✅ Light imports only; GUI / plotting libraries are imported where they are used
 import os
 import re
 import json
+import math
+import hashlib
+import functools
+import time
+import signal
+import tempfile
+import selectors
 import threading
 import webbrowser
 from io import BytesIO
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image, ImageTk
-import matplotlib
+from importlib.util import find_spec
+from popper_daemon import READY as DAEMON_READY, SENTINEL as DAEMON_SENTINEL
+
+# ✅ orjson when available, stdlib json otherwise (both produce/consume bytes)
+try:
+    import orjson
 
-import tkinter as tk
-from tkinter import scrolledtext, filedialog
-import ttkbootstrap as ttk
-from ttkbootstrap.constants import *
+    def json_dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
 
-# ======================
-# ✅ FULL LATEX RENDERING
-# ======================
-matplotlib.use("Agg")
-matplotlib.rcParams["text.usetex"] = True
-matplotlib.rcParams["font.family"] = "serif"
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj, indent=False):
+        return json.dumps(obj, indent=2 if indent else None).encode()
 
-import matplotlib.pyplot as plt
+    json_loads = json.loads
 
 # =======================
 # ✅ CONSTANTS & SETTINGS
@@ -68,120 +76,209 @@ REQUIRED_PY_LIBS = [
     "bitarray",
     "python-sat[pblib,aiger]",
     "matplotlib",
-    "pillow"
+    "pillow",
+    "orjson"  # optional: falls back to stdlib json
 ]
+IMPORT_MAPPING = {
+    "pillow": "PIL",
+    "python-sat": "pysat",
+    "ttkbootstrap": "ttkbootstrap",
+    "clingo": "clingo",
+    "pyswip": "pyswip",
+    "bitarray": "bitarray",
+    "matplotlib": "matplotlib"
+}
+SYSTEM_DEPS = {  # dependency -> executables that must be on PATH
+    "swipl": ["swipl"],
+    "clingo": ["clingo"],
+    "latex": ["latex", "dvipng"],
+    "git": ["git"]
+}
+APT_PACKAGES = {
+    "swipl": ["swi-prolog"],
+    "clingo": ["clingo"],
+    "latex": [
+        "texlive-latex-base", "texlive-latex-recommended",
+        "texlive-latex-extra", "texlive-fonts-recommended",
+        "texlive-fonts-extra", "texlive-lang-european", "dvipng"
+    ],
+    "git": ["git"]
+}
 POPPER_GIT = "https://github.com/logic-and-learning-lab/popper.git"
 DEFAULT_POPPER_PATHS = [
     "~/popper/popper.py",
     "~/popper/popper/popper.py",
     "~/popper/popper_ilp/popper.py"
 ]
+POPPER_SEARCH_SKIP_DIRS = {".git", "__pycache__", "tests"}
 LAST_PATHS_FILE = "last_paths.json"
 HISTORY_FILE = "history.json"
+HISTORY_LOG_FILE = "history.jsonl"  # append-only, folded into HISTORY_FILE on exit
+WORK_DIR = "popper_tmp"  # reused across runs, see stage_inputs()
+POPPER_DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "popper_daemon.py")
+RENDER_CACHE_DIR = Path.home() / ".popper_runner" / "render_cache"
+RENDER_CACHE_SIZE = 256
+TIMEOUT_UNITS = {
+    "s": 1, "sec": 1, "secs": 1,
+    "m": 60, "min": 60, "mins": 60,
+    "h": 3600, "d": 86400
+}
+TIMEOUT_MAX = 30 * 86400  # anything longer overflows select() on some platforms
+DAEMON_START_TIMEOUT = 60  # seconds to import Popper before giving up on the worker
 POPPER_PATH = None
 last_error_message = ""
 
 SWI_PROLOG_URL = "https://www.swi-prolog.org/download/stable"
 CLINGO_URL = "https://potassco.org/clingo/"
 
+use_tex = "--usetex" in sys.argv  # ✅ MathText by default, full LaTeX is opt-in (never changed after setup)
 history_store = []  # session + loaded history
-render_cache = {}
+history_pending = []  # not yet written to HISTORY_LOG_FILE
+render_cache = OrderedDict()  # LRU, capped at RENDER_CACHE_SIZE
+render_fig, render_ax = None, None  # ✅ One figure reused for every render
+render_lock = threading.Lock()
+paths_lock = threading.Lock()
 running = False  # ✅ Prevent multiple threads
+popper_daemon = None  # see start_popper_daemon()
+missing_system_deps = []  # filled by first_time_setup(), installable from the GUI
 
 # =======================
 # ✅ FIXED FIRST-TIME SETUP HELPERS
 # =======================
-def ensure_pip():
+def py_import_name(pkg):
+    base_pkg = pkg.split("[")[0]
+    return IMPORT_MAPPING.get(base_pkg, base_pkg.replace("-", "_"))
+
+def can_import(name):
+    # find_spec locates the package without executing it (no matplotlib import cost)
     try:
-        import pip
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def probe_dependencies():
+    # ✅ All probes are independent I/O checks, so run them side by side
+    # Keyed by kind: "clingo" is both a Python package and a binary on PATH
+    tasks = [(("py", "pip"), lambda: can_import("pip"))]
+    tasks += [(("py", pkg), lambda pkg=pkg: can_import(py_import_name(pkg))) for pkg in REQUIRED_PY_LIBS]
+    tasks += [(("bin", tool), lambda tool=tool: shutil.which(tool) is not None) for tools in SYSTEM_DEPS.values() for tool in tools]
+
+    def probe(task):
+        name, check = task
+        return name, check()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return dict(executor.map(probe, tasks))
+
+def ensure_pip(found):
+    if found["py", "pip"]:
         print("[OK] Pip available.")
-    except ImportError:
+    else:
         print("[INFO] Pip not found. Installing...")
         subprocess.check_call([sys.executable, "-m", "ensurepip", "--upgrade"])
         subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", "pip"])
 
-def install_missing_libs():
-    IMPORT_MAPPING = {
-        "pillow": "PIL",
-        "python-sat": "pysat",
-        "ttkbootstrap": "ttkbootstrap",
-        "clingo": "clingo",
-        "pyswip": "pyswip",
-        "bitarray": "bitarray",
-        "matplotlib": "matplotlib"
-    }
-
+def install_missing_libs(found):
+    missing = []
     for pkg in REQUIRED_PY_LIBS:
-        base_pkg = pkg.split("[")[0]
-        import_name = IMPORT_MAPPING.get(base_pkg, base_pkg.replace("-", "_"))
+        if found["py", pkg]:
+            print(f"[OK] {pkg} already installed.")
+        else:
+            missing.append(pkg)
+
+    if not missing:
+        return
 
+    # ✅ One pip run for the whole set; retry singly only if it fails
+    print(f"[INFO] Installing missing packages: {', '.join(missing)}")
+    try:
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "--disable-pip-version-check", *missing])
+        print(f"[DONE] Installed: {', '.join(missing)}")
+        return
+    except Exception as e:
+        print(f"[WARNING] Batch install failed ({e}). Retrying one by one...")
+
+    for pkg in missing:
         try:
-            __import__(import_name)
-            print(f"[OK] {pkg} already installed.")
-        except ImportError:
-            print(f"[INFO] Installing missing package: {pkg}")
-            try:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", pkg])
-                print(f"[DONE] Installed: {pkg}")
-            except Exception as e:
-                print(f"[ERROR] Failed to install {pkg}: {e}")
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "--disable-pip-version-check", pkg])
+            print(f"[DONE] Installed: {pkg}")
+        except Exception as e:
+            print(f"[ERROR] Failed to install {pkg}: {e}")
 
 def auto_install_dependencies(dep_name):
+    # Homebrew / manual installs; Linux goes through install_apt_packages(). Failures propagate to the GUI.
     os_name = platform.system().lower()
-    try:
-        if dep_name == "swipl":
-            if os_name == "windows":
-                webbrowser.open(SWI_PROLOG_URL)
-            elif os_name == "linux":
-                subprocess.check_call(["sudo", "apt-get", "update"])
-                subprocess.check_call(["sudo", "apt-get", "install", "-y", "swi-prolog"])
-            elif os_name == "darwin":
-                subprocess.check_call(["brew", "install", "swi-prolog"])
-        elif dep_name == "clingo":
-            if os_name == "windows":
-                webbrowser.open(CLINGO_URL)
-            elif os_name == "linux":
-                subprocess.check_call(["sudo", "apt-get", "install", "-y", "clingo"])
-            elif os_name == "darwin":
-                subprocess.check_call(["brew", "install", "clingo"])
-        elif dep_name == "latex":
-            if os_name == "windows":
-                webbrowser.open("https://miktex.org/download")
-            elif os_name == "linux":
-                subprocess.check_call(["sudo", "apt-get", "update"])
-                subprocess.check_call([
-                    "sudo", "apt-get", "install", "-y",
-                    "texlive-latex-base", "texlive-latex-recommended",
-                    "texlive-latex-extra", "texlive-fonts-recommended",
-                    "texlive-fonts-extra", "texlive-lang-european", "dvipng"
-                ])
-            elif os_name == "darwin":
-                subprocess.check_call(["brew", "install", "--cask", "mactex"])
-        elif dep_name == "git":
-            if os_name == "linux":
-                subprocess.check_call(["sudo", "apt-get", "update"])
-                subprocess.check_call(["sudo", "apt-get", "install", "-y", "git"])
-            elif os_name == "darwin":
-                subprocess.check_call(["brew", "install", "git"])
-            elif os_name == "windows":
-                webbrowser.open("https://git-scm.com/download/win")
-                print("[INFO] Please install Git manually on Windows.")
-    except Exception as e:
-        print(f"[WARNING] Automatic installation of {dep_name} failed: {e}")
-
-def check_system_dependencies():
-    if not shutil.which("swipl"):
-        auto_install_dependencies("swipl")
-    if not shutil.which("clingo"):
-        auto_install_dependencies("clingo")
-    if not shutil.which("latex") or not shutil.which("dvipng"):
+    if dep_name == "swipl":
+        if os_name == "windows":
+            webbrowser.open(SWI_PROLOG_URL)
+        elif os_name == "darwin":
+            subprocess.check_call(["brew", "install", "swi-prolog"])
+    elif dep_name == "clingo":
+        if os_name == "windows":
+            webbrowser.open(CLINGO_URL)
+        elif os_name == "darwin":
+            subprocess.check_call(["brew", "install", "clingo"])
+    elif dep_name == "latex":
+        if os_name == "windows":
+            webbrowser.open("https://miktex.org/download")
+        elif os_name == "darwin":
+            subprocess.check_call(["brew", "install", "--cask", "mactex"])
+    elif dep_name == "git":
+        if os_name == "darwin":
+            subprocess.check_call(["brew", "install", "git"])
+        elif os_name == "windows":
+            webbrowser.open("https://git-scm.com/download/win")
+            print("[INFO] Please install Git manually on Windows.")
+
+def as_root(cmd):
+    # ✅ Runs on a GUI background thread: never wait on a password prompt nobody can see
+    if os.geteuid() == 0:
+        return cmd
+    if shutil.which("pkexec") and (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return ["pkexec", *cmd]  # graphical password dialog
+    return ["sudo", "-n", *cmd]  # fails at once unless sudo needs no password
+
+def install_apt_packages(deps):
+    # ✅ One apt transaction (single update + install, one password prompt) for everything missing
+    packages = [pkg for dep in deps for pkg in APT_PACKAGES[dep]]
+    print(f"[INFO] Installing system packages: {' '.join(packages)}")
+    script = f"apt-get update && apt-get install -y {' '.join(packages)}"
+    result = subprocess.run(as_root(["sh", "-c", script]), stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        reason = (result.stderr.strip().splitlines() or [f"exit status {result.returncode}"])[-1]
+        raise RuntimeError(f"apt-get failed: {reason}")
+
+def check_system_dependencies(found):
+    # ✅ Detection only: installing needs sudo/apt, so it is left to the GUI button
+    global use_tex
+    missing = [dep for dep in ("swipl", "clingo", "git") if not all(found["bin", t] for t in SYSTEM_DEPS[dep])]
+    if use_tex and not all(found["bin", t] for t in SYSTEM_DEPS["latex"]):
         print("[WARNING] LaTeX not detected. Falling back to MathText.")
-        matplotlib.rcParams["text.usetex"] = False
+        use_tex = False
+        missing.append("latex")
+    if missing:
+        print(f"[WARNING] Missing system dependencies: {', '.join(missing)}")
+    return missing
+
+def install_system_dependencies(deps):
+    # Returns (still missing, error messages) so the GUI can say why something is still missing
+    errors = []
+    if platform.system().lower() == "linux":
+        try:
+            install_apt_packages(deps)
+        except Exception as e:
+            errors.append(f"Installing {', '.join(deps)} failed: {e}")
+    else:
+        for dep in deps:
+            try:
+                auto_install_dependencies(dep)
+            except Exception as e:
+                errors.append(f"Installing {dep} failed: {e}")
+    return [dep for dep in deps if not all(shutil.which(t) for t in SYSTEM_DEPS[dep])], errors
 
 def check_or_install_popper():
     global POPPER_PATH
-    if not shutil.which("git"):
-        auto_install_dependencies("git")
 
     paths_cache = load_last_paths()
     if paths_cache.get("popper_path") and os.path.exists(paths_cache["popper_path"]):
@@ -197,28 +294,53 @@ def check_or_install_popper():
 
     popper_dir = os.path.expanduser("~/popper")
     if not os.path.exists(popper_dir):
+        if not shutil.which("git"):
+            print("[WARNING] Git is missing, cannot clone Popper yet.")
+            return
         subprocess.check_call(["git", "clone", "--depth", "1", POPPER_GIT, popper_dir])
 
-    for root, _, files in os.walk(popper_dir):
-        if "popper.py" in files:
-            POPPER_PATH = os.path.join(root, "popper.py")
-            save_last_paths(popper_path=POPPER_PATH)
-            return
+    hit = next(find_popper_script(popper_dir), None)
+    if hit:
+        POPPER_PATH = str(hit)
+        save_last_paths(popper_path=POPPER_PATH)
+        return
+
+def find_popper_script(root):
+    # ✅ Top-down like os.walk, but lazy and skipping dirs that never hold the entry point
+    subdirs = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in POPPER_SEARCH_SKIP_DIRS:
+                        subdirs.append(entry.path)
+                elif entry.name == "popper.py":
+                    yield entry.path
+    except OSError:
+        return  # unreadable dir, skip it
+    for sub in subdirs:
+        yield from find_popper_script(sub)
 
 def save_last_paths(**paths):
-    existing = load_last_paths()
-    existing.update(paths)
-    with open(LAST_PATHS_FILE, "w") as f:
-        json.dump(existing, f)
+    with paths_lock:  # may run on a background thread, see open_file_dialog()
+        existing = load_last_paths()
+        existing.update(paths)
+        with open(LAST_PATHS_FILE, "wb") as f:
+            f.write(json_dumps(existing))
 
 def load_last_paths():
-    return json.load(open(LAST_PATHS_FILE)) if os.path.exists(LAST_PATHS_FILE) else {}
+    if not os.path.exists(LAST_PATHS_FILE):
+        return {}
+    with open(LAST_PATHS_FILE, "rb") as f:
+        return json_loads(f.read())
 
 def first_time_setup():
     print("\n[SETUP] Running first-time environment setup...")
-    ensure_pip()
-    install_missing_libs()
-    check_system_dependencies()
+    found = probe_dependencies()
+    ensure_pip(found)
+    install_missing_libs(found)
+    global missing_system_deps
+    missing_system_deps = check_system_dependencies(found)
     check_or_install_popper()
     print("[SETUP] Environment ready!\n")
 
@@ -228,170 +350,445 @@ first_time_setup()
 # ✅ HISTORY MANAGEMENT
 # =======================
 def load_history():
+    history = []
     if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as f:
+        with open(HISTORY_FILE, "rb") as f:
             try:
-                return json.load(f)
+                history = json_loads(f.read())
             except json.JSONDecodeError:
-                return []
-    return []
+                history = []
+    # ✅ Entries appended since the last consolidation (e.g. after a crash)
+    if os.path.exists(HISTORY_LOG_FILE):
+        with open(HISTORY_LOG_FILE, "rb") as f:
+            for line in f:
+                try:
+                    history.append(json_loads(line))
+                except json.JSONDecodeError:
+                    pass
+    return history
+
+def flush_history():
+    if not history_pending:
+        return
+    with open(HISTORY_LOG_FILE, "ab") as f:
+        f.write(b"".join(json_dumps(entry) + b"\n" for entry in history_pending))
+    history_pending.clear()
 
 def save_history():
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history_store, f, indent=2)
+    with open(HISTORY_FILE, "wb") as f:
+        f.write(json_dumps(history_store, indent=True))
+    history_pending.clear()
+    if os.path.exists(HISTORY_LOG_FILE):
+        os.remove(HISTORY_LOG_FILE)
 
 def clear_history():
     global history_store
     history_store = []
     save_history()
+    clear_latex_caches()
 
 # =======================
 # ✅ LATEX HELPERS
 # =======================
+_PRED_RE = re.compile(r"([a-zA-Z0-9_]+)\((.*)\)")
+_TS_RE = re.compile(r"^\d{2}:\d{2}:\d{2}\s+")
+_VAR_RE = re.compile(r"[A-Z][a-zA-Z0-9_]*")
+
+_BODY_OPS = {
+    ("add", 3): lambda a: f"{a[2]} = {a[0]} + {a[1]}",
+    ("sub", 3): lambda a: f"{a[2]} = {a[0]} - {a[1]}",
+    ("mult", 3): lambda a: f"{a[2]} = {a[0]} \\times {a[1]}",
+    ("succ", 2): lambda a: f"{a[1]} = {a[0]} + 1",
+    ("divisible", 2): lambda a: f"{a[0]} \\ \\mathrm{{mod}}\\ {a[1]} = 0",
+    ("greater_than", 2): lambda a: f"{a[0]} > {a[1]}",
+    ("less_than", 2): lambda a: f"{a[0]} < {a[1]}",
+    ("eq", 2): lambda a: f"{a[0]} = {a[1]}",
+    ("neq", 2): lambda a: f"{a[0]} \\neq {a[1]}",
+}
+
+# ✅ Pure helpers: Popper repeats the same literals across hypotheses, so memoize them
+@functools.lru_cache(maxsize=4096)
 def latex_var(var):
     return f"V_{{{var[1:]}}}" if var.lower().startswith("v") and var[1:].isdigit() else var
 
+@functools.lru_cache(maxsize=4096)
 def safe_parse_predicate(pred):
     pred = pred.strip()
     if "(" not in pred:
-        return pred, []
-    match = re.match(r"([a-zA-Z0-9_]+)\((.*)\)", pred)
+        return pred, ()
+    match = _PRED_RE.match(pred)
     if not match:
-        return pred, []
+        return pred, ()
     name = match.group(1)
-    args = [latex_var(a.strip()) for a in match.group(2).split(",") if a.strip()]
+    args = tuple(latex_var(a.strip()) for a in match.group(2).split(",") if a.strip())
     return name, args
 
+@functools.lru_cache(maxsize=4096)
 def translate_body_literal(literal):
     neg = literal.startswith("\\+")
     literal = literal.replace("\\+", "").strip()
     name, args = safe_parse_predicate(literal)
-    ops = {
-        ("add", 3): lambda a: f"{a[2]} = {a[0]} + {a[1]}",
-        ("sub", 3): lambda a: f"{a[2]} = {a[0]} - {a[1]}",
-        ("mult", 3): lambda a: f"{a[2]} = {a[0]} \\times {a[1]}",
-        ("succ", 2): lambda a: f"{a[1]} = {a[0]} + 1",
-        ("divisible", 2): lambda a: f"{a[0]} \\mod {a[1]} = 0",
-        ("greater_than", 2): lambda a: f"{a[0]} > {a[1]}",
-        ("less_than", 2): lambda a: f"{a[0]} < {a[1]}",
-        ("eq", 2): lambda a: f"{a[0]} = {a[1]}",
-        ("neq", 2): lambda a: f"{a[0]} \\neq {a[1]}",
-    }
-    expr = ops.get((name, len(args)), lambda a: f"{name}({', '.join(a)})" if a else name)(args)
-    return f"\\lnot({expr})" if neg else expr
+    expr = _BODY_OPS.get((name, len(args)), lambda a: f"{name}({', '.join(a)})" if a else name)(args)
+    return f"\\neg({expr})" if neg else expr
+
+def clear_latex_caches():
+    for helper in (latex_var, safe_parse_predicate, translate_body_literal):
+        helper.cache_clear()
+
+def popper_line_to_latex(raw):
+    line = raw.strip().rstrip(".")
+    if not line or line.startswith(("tp:", "Precision", "Recall", "Size", "FN:", "FP:", "TN:")):
+        return None
+    line = _TS_RE.sub("", line)
+    if ":-" in line:
+        head, body = map(str.strip, line.split(":-"))
+        head_name, head_args = safe_parse_predicate(head)
+        body_literals = [translate_body_literal(b.strip()) for b in body.split(",") if b.strip()]
+        # dict keeps first-seen order, so the quantifier (and render cache key) is stable across runs
+        vars_seen = dict.fromkeys(head_args)
+        for lit in body_literals:
+            for v in _VAR_RE.findall(lit):
+                vars_seen[v] = None
+        quantifiers = f"\\forall {', '.join(vars_seen)}\\ "
+        return (f"{quantifiers}({head_name}({', '.join(head_args)}) \\Leftarrow " +
+                " \\wedge ".join(body_literals) + ")")
+    name, args = safe_parse_predicate(line)
+    return f"{name}({', '.join(args)})"
 
 def popper_to_latex(hypothesis):
     latex_lines = []
     for raw in hypothesis.strip().splitlines():
-        line = raw.strip().rstrip(".")
-        if not line or line.startswith(("tp:", "Precision", "Recall", "Size", "FN:", "FP:", "TN:")):
-            continue
-        line = re.sub(r"^\d{2}:\d{2}:\d{2}\s+", "", line)
-        if ":-" in line:
-            head, body = map(str.strip, line.split(":-"))
-            head_name, head_args = safe_parse_predicate(head)
-            body_literals = [translate_body_literal(b.strip()) for b in body.split(",") if b.strip()]
-            vars_set = {v for v in head_args} | {v for lit in body_literals for v in re.findall(r"[A-Z][a-zA-Z0-9_]*", lit)}
-            quantifiers = f"\\forall {', '.join(vars_set)}\\ "
-            latex_lines.append(f"{quantifiers}({head_name}({', '.join(head_args)}) \\Leftarrow " +
-                               " \\land ".join(body_literals) + ")")
-        else:
-            name, args = safe_parse_predicate(line)
-            latex_lines.append(f"{name}({', '.join(args)})")
+        latex = popper_line_to_latex(raw)
+        if latex is not None:
+            latex_lines.append(latex)
     return latex_lines
 
+def get_render_figure():
+    global render_fig, render_ax
+    if render_fig is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        matplotlib.rcParams["text.usetex"] = use_tex  # decided once by check_system_dependencies()
+        matplotlib.rcParams["font.family"] = "serif"
+        import matplotlib.pyplot as plt
+        render_fig, render_ax = plt.subplots(figsize=(6, 4))
+    return render_fig, render_ax
+
+def warm_up_renderer():
+    # ✅ Pay the matplotlib import and first (La)TeX pass off the UI thread; bypasses both caches
+    try:
+        with render_lock:
+            fig, ax = get_render_figure()
+            ax.cla()
+            ax.axis("off")
+            ax.text(0.05, 0.95, "$x = x$", ha="left", va="top")
+            fig.savefig(BytesIO(), format="png", dpi=120)
+    except Exception as e:
+        print(f"[WARNING] Renderer warm-up failed ({e}).")
+
+def cache_rendered_image(cache_key, img):
+    render_cache[cache_key] = img
+    render_cache.move_to_end(cache_key)
+    if len(render_cache) > RENDER_CACHE_SIZE:
+        render_cache.popitem(last=False)
+
 def render_latex_to_image(latex_lines, base_font=14):
-    cache_key = (tuple(latex_lines), base_font)
+    from PIL import Image
+    cache_key = (tuple(latex_lines), base_font, use_tex)
     if cache_key in render_cache:
+        render_cache.move_to_end(cache_key)
         return render_cache[cache_key]
+    # ✅ Second level: PNGs rendered by earlier sessions
+    cache_file = RENDER_CACHE_DIR / f"{hashlib.sha1(repr(cache_key).encode()).hexdigest()}.png"
+    if cache_file.exists():
+        try:
+            img = Image.open(cache_file)
+            img.load()
+            cache_rendered_image(cache_key, img)
+            return img
+        except (OSError, SyntaxError, ValueError) as e:
+            # ✅ Truncated or corrupt PNG: drop it and render again
+            print(f"[WARNING] Discarding broken render cache entry {cache_file.name} ({e}).")
+            cache_file.unlink(missing_ok=True)
     num_lines = max(len(latex_lines), 1)
     font_size = max(8, base_font - (num_lines // 3))
     fig_height = max(2, 0.6 + 0.25 * num_lines)
-    fig, ax = plt.subplots(figsize=(6, fig_height))
-    ax.axis("off")
-    try:
+    with render_lock:
+        fig, ax = get_render_figure()
+        ax.cla()
+        ax.axis("off")
+        fig.set_size_inches(6, fig_height)
         for i, line in enumerate(latex_lines):
             ax.text(0.05, 1 - 0.12 * i, f"${line}$", fontsize=font_size, ha="left", va="top")
         buf = BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight", dpi=120)
-        plt.close(fig)
-        buf.seek(0)
-        img = Image.open(buf)
-        render_cache[cache_key] = img
-        return img
-    except Exception as e:
-        print(f"[WARNING] LaTeX rendering failed ({e}). Falling back to MathText...")
-        matplotlib.rcParams["text.usetex"] = False
-        plt.close(fig)
-        return render_latex_to_image(latex_lines, base_font)
+        fig.savefig(buf, format="png", bbox_inches="tight", dpi=120)
+    buf.seek(0)
+    img = Image.open(buf)
+    try:
+        RENDER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # ✅ Write to a temp file and rename, so a crash never leaves half a PNG behind
+        fd, tmp_name = tempfile.mkstemp(dir=RENDER_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp_name, cache_file)
+        except OSError:
+            os.unlink(tmp_name)
+            raise
+    except OSError as e:
+        print(f"[WARNING] Could not write render cache ({e}).")
+    cache_rendered_image(cache_key, img)
+    return img
 
 # =======================
 # ✅ POPPER EXECUTION
 # =======================
-def extract_solutions(stdout):
+_IGNORE_OUTPUT_RE = re.compile("|".join(map(re.escape, ["pkg_resources", "Clauses of", "discontiguous"])))
+_SOLUTION_TAG_RE = re.compile(r"SOLUTION|New best hypothesis|Best program")
+_CLAUSE_RE = re.compile(r":-|\.")
+
+def extract_solutions(lines):
     solutions, current = [], []
-    for line in stdout.splitlines():
-        if any(tag in line for tag in ["SOLUTION", "New best hypothesis", "Best program"]):
+    for line in lines:
+        if _SOLUTION_TAG_RE.search(line):
             if current:
                 solutions.append("\n".join(current))
                 current = []
-        elif line.strip() and (":-" in line or "." in line):
+        elif _CLAUSE_RE.search(line):
             current.append(line.strip())
     if current:
         solutions.append("\n".join(current))
     return solutions
 
+def iter_output_lines(process, timeout_sec=None):
+    # ✅ Raw fd reads: lines surface as soon as Popper flushes, and the timeout is enforced mid-stream
+    fd = process.stdout.fileno()
+    deadline = time.monotonic() + timeout_sec if timeout_sec else None
+    buf = bytearray()
+    sel = selectors.DefaultSelector() if os.name != "nt" else None  # Windows can't select() on pipes
+    if sel:
+        sel.register(fd, selectors.EVENT_READ)
+    try:
+        while True:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, timeout_sec)
+            if sel and not sel.select(timeout=remaining):
+                continue
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            buf += chunk
+            end = buf.rfind(b"\n") + 1
+            if end:
+                for line in bytes(buf[:end]).splitlines(keepends=True):
+                    yield line.decode("utf-8", "replace")
+                del buf[:end]
+        if buf:
+            yield buf.decode("utf-8", "replace")
+    finally:
+        if sel:
+            sel.close()
+
+def start_popper_daemon(log=print):
+    # ✅ Keep one worker with Popper already imported; reused by every run of this session
+    global popper_daemon
+    if popper_daemon and popper_daemon.poll() is None:
+        return popper_daemon
+    popper_daemon = None
+    if os.name == "nt" or not POPPER_PATH:  # the worker forks once per run
+        return None
+    try:
+        daemon = subprocess.Popen(
+            [sys.executable, "-u", "-W", "ignore::UserWarning", POPPER_DAEMON_SCRIPT, POPPER_PATH],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            bufsize=0, start_new_session=True
+        )
+    except OSError as e:
+        log(f"[WARNING] Could not start Popper worker ({e}).\n")
+        return None
+    try:
+        for line in iter_output_lines(daemon, DAEMON_START_TIMEOUT):
+            if line.rstrip().endswith(DAEMON_READY):
+                popper_daemon = daemon
+                return daemon
+            if not _IGNORE_OUTPUT_RE.search(line):
+                log(line)
+        # Worker died while importing Popper: callers fall back to a one-shot run
+        log("[WARNING] Popper worker failed to start. Falling back to a one-shot run.\n")
+    except subprocess.TimeoutExpired:
+        log(f"[WARNING] Popper worker not ready after {DAEMON_START_TIMEOUT}s. Falling back to a one-shot run.\n")
+    kill_popper_daemon(daemon)
+    return None
+
+def kill_popper_daemon(daemon):
+    try:
+        os.killpg(daemon.pid, signal.SIGKILL)  # also takes down a forked run
+    except OSError:
+        pass
+    daemon.wait()
+    daemon.stdin.close()
+    daemon.stdout.close()
+
+def stop_popper_daemon():
+    global popper_daemon
+    if not popper_daemon:
+        return
+    kill_popper_daemon(popper_daemon)
+    popper_daemon = None
+
+def submit_popper_job(work_dir, log=print):
+    daemon = start_popper_daemon(log)
+    if daemon is None:
+        return None
+    try:
+        daemon.stdin.write(json_dumps({"work_dir": os.path.abspath(work_dir)}) + b"\n")
+    except OSError:
+        stop_popper_daemon()
+        return None
+    return daemon
+
+def stage_file(src, dst):
+    # ✅ Popper only reads its inputs, so a hardlink is enough; copy across devices / on failure
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+def stage_inputs(work_dir, inputs):
+    # ✅ work_dir persists across runs; only restage inputs whose source changed
+    os.makedirs(work_dir, exist_ok=True)
+    manifest_path = os.path.join(work_dir, ".manifest.json")
+    try:
+        with open(manifest_path, "rb") as f:
+            manifest = json_loads(f.read())
+    except (OSError, ValueError):
+        manifest = {}
+
+    changed = False
+    for name, src in inputs.items():
+        st = os.stat(src)
+        stamp = [os.path.abspath(src), st.st_mtime, st.st_size]
+        dst = os.path.join(work_dir, name)
+        if manifest.get(name) != stamp or not os.path.exists(dst):
+            stage_file(src, dst)
+            manifest[name] = stamp
+            changed = True
+
+    if changed:
+        with open(manifest_path, "wb") as f:
+            f.write(json_dumps(manifest))
+
+def parse_timeout(timeout):
+    # "300s", "300 sec", "1.5s", "5m", "2h", "1d" or a bare number of seconds
+    timeout = timeout.strip().lower() if timeout else ""
+    if not timeout:
+        return None
+    number = timeout.rstrip("abcdefghijklmnopqrstuvwxyz ")
+    unit = timeout[len(number):].strip() or "s"
+    if unit not in TIMEOUT_UNITS:
+        raise ValueError(f"unknown time unit in {timeout!r}")
+    seconds = float(number) * TIMEOUT_UNITS[unit]
+    # 0 would mean "no timeout" downstream and a negative one expires at once
+    if not math.isfinite(seconds) or not 0 < seconds <= TIMEOUT_MAX:
+        raise ValueError(f"timeout out of range: {timeout!r}")
+    return math.ceil(seconds)  # "0.5s" waits a full second instead of becoming 0
+
 def run_popper(bk, bias, exs, timeout, console_callback, result_callback, realtime=False, after=None):
     global last_error_message
     last_error_message = ""
 
+    if not POPPER_PATH:
+        console_callback("[ERROR] Popper not found! Install the missing system dependencies first.\n", "red")
+        return
+
     for f in [bk, bias, exs]:
         if not os.path.exists(f):
             console_callback(f"[ERROR] File '{f}' not found!\n", "red")
             return
 
-    work_dir = "popper_tmp"
-    os.makedirs(work_dir, exist_ok=True)
-    for src, name in zip([bk, bias, exs], ["bk.pl", "bias.pl", "exs.pl"]):
-        shutil.copy(src, os.path.join(work_dir, name))
+    try:
+        timeout_sec = parse_timeout(timeout)
+    except ValueError:
+        console_callback(f"[ERROR] Invalid timeout '{timeout}'! Use e.g. 300s, 5m or 1h.\n", "red")
+        return
+
+    work_dir = WORK_DIR
+    stage_inputs(work_dir, {"bk.pl": bk, "bias.pl": bias, "exs.pl": exs})
 
     console_callback("[INFO] Running Popper...\n", "green")
-    timeout_sec = int(re.sub(r"\D", "", timeout)) if timeout else None
-    cmd = ["python3", "-W", "ignore::UserWarning", POPPER_PATH, work_dir]
+    cmd = ["python3", "-u", "-W", "ignore::UserWarning", POPPER_PATH, work_dir]
 
+    process = submit_popper_job(work_dir, lambda line: after(console_callback, line, "yellow"))
+    use_daemon = process is not None
     try:
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        stdout_lines, current_stdout = [], []
-        for line in process.stdout:
-            if not any(ignore in line for ignore in ["pkg_resources", "Clauses of", "discontiguous"]):
-                stdout_lines.append(line)
-                after(console_callback, line, "white")
-                if realtime and (":-" in line or "." in line):
-                    current_stdout.append(line.strip())
-                    after(result_callback, popper_to_latex("\n".join(current_stdout)))
-        process.wait(timeout=timeout_sec)
+        while True:
+            if not use_daemon:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+            stdout_lines, latex_acc = [], []
+            finished = not use_daemon
+            for line in iter_output_lines(process, timeout_sec):
+                if use_daemon and line.rstrip().endswith(DAEMON_SENTINEL):
+                    # A partial last line of the run (no trailing newline) may be glued to the sentinel
+                    finished = True
+                    line = line.rstrip()[:-len(DAEMON_SENTINEL)]
+                    line = line + "\n" if line else ""
+                if line and not _IGNORE_OUTPUT_RE.search(line):
+                    stdout_lines.append(line)
+                    after(console_callback, line, "white")
+                    if realtime and (":-" in line or "." in line):
+                        # ✅ Translate only the new line instead of re-translating the whole stream
+                        latex = popper_line_to_latex(line)
+                        if latex is not None:
+                            latex_acc.append(latex)
+                            after(result_callback, list(latex_acc))
+                if use_daemon and finished:
+                    break
+            if use_daemon and not finished:
+                # ✅ Worker died mid-run: retry this job once as a one-shot run
+                stop_popper_daemon()
+                after(console_callback, "[WARNING] Popper worker exited unexpectedly. Retrying with a one-shot run...\n", "yellow")
+                use_daemon = False
+                continue
+            break
+        if not use_daemon:
+            process.wait(timeout=timeout_sec)
         if not realtime:
-            solutions = extract_solutions("".join(stdout_lines))
+            solutions = extract_solutions(stdout_lines)
             if solutions:
                 for sol in solutions:
                     after(result_callback, popper_to_latex(sol))
             else:
                 after(console_callback, "[WARNING] No hypothesis generated.\n", "yellow")
     except subprocess.TimeoutExpired:
+        if use_daemon:
+            stop_popper_daemon()
+        else:
+            process.kill()
+            process.wait()
         after(console_callback, f"[ERROR] Popper timed out after {timeout}\n", "red")
     finally:
-        shutil.rmtree(work_dir, ignore_errors=True)
-        after(console_callback, f"[INFO] Temporary folder '{work_dir}' deleted.\n", "green")
+        if process and not use_daemon:
+            process.stdout.close()
 
 # =======================
 # ✅ GUI
 # =======================
 def launch_gui():
     global history_store, running
+    ensure_tkinter_before_import()
+    import tkinter as tk
+    from tkinter import scrolledtext, filedialog
+    import ttkbootstrap as ttk
+    from PIL import ImageTk
+
     app = ttk.Window(themename="flatly")
     app.title("Popper ILP Runner")
     app.geometry("1000x900")
     app.minsize(900, 650)
+    threading.Thread(target=warm_up_renderer, daemon=True).start()
 
     paths = load_last_paths()
     history_store = load_history()
@@ -407,7 +804,8 @@ def launch_gui():
             entry.insert(0, path)
             status_bar.config(text=f"File selected: {os.path.basename(path)}")
             paths[key] = path
-            save_last_paths(**paths)
+            # ✅ Keep the disk write off the Tk event loop
+            threading.Thread(target=save_last_paths, kwargs={key: path}, daemon=True).start()
 
     def update_console(text, color="white"):
         console.config(state="normal")
@@ -417,25 +815,41 @@ def launch_gui():
         status_bar.config(text=f"[Console] {text.strip()[:60]}...")
 
     def update_results(latex_lines):
-        img = render_latex_to_image(latex_lines)
+        try:
+            img = render_latex_to_image(latex_lines)
+        except Exception as e:
+            update_console(f"[ERROR] Rendering failed: {e}\n", "red")
+            return
         tk_img = ImageTk.PhotoImage(img)
         result_label.config(image=tk_img)
         result_label.image = tk_img
         if not realtime_mode.get():
-            history_store.append({
+            entry = {
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "hypotheses": latex_lines
-            })
-            save_history()
-            refresh_history()
+            }
+            history_store.append(entry)
+            # ✅ Batch bursts of results into one append to the log
+            if not history_pending:
+                app.after(1000, flush_history)
+            history_pending.append(entry)
+            add_history_row(entry)
             status_bar.config(text=f"✅ Hypothesis Rendered (Total: {len(history_store)})")
 
-    def refresh_history():
-        history_box.config(state="normal")
-        history_box.delete("1.0", tk.END)
-        for i, item in enumerate(history_store, 1):
-            history_box.insert(tk.END, f"#{i} - {item['timestamp']}\n" + "\n".join(item["hypotheses"]) + "\n\n")
-        history_box.config(state="disabled")
+    pending_results = {"lines": None}
+
+    def queue_results(latex_lines):
+        # ✅ Realtime mode: coalesce bursts so only the latest accumulator gets rendered
+        if pending_results["lines"] is None:
+            app.after(200, flush_results)
+        pending_results["lines"] = latex_lines
+
+    def flush_results():
+        latex_lines, pending_results["lines"] = pending_results["lines"], None
+        update_results(latex_lines)
+
+    def add_history_row(item):
+        history_tree.insert("", "end", values=(item["timestamp"], "; ".join(item["hypotheses"])))
 
     def run_thread():
         global running
@@ -446,13 +860,21 @@ def launch_gui():
         progress.start()
 
         def finish():
+            global running
             progress.stop()
             running = False
 
-        threading.Thread(target=lambda: (run_popper(
-            bk_entry.get(), bias_entry.get(), exs_entry.get(),
-            timeout_entry.get(), update_console, update_results, realtime_mode.get(), after
-        ), finish()), daemon=True).start()
+        realtime = realtime_mode.get()
+        def work():
+            try:
+                run_popper(
+                    bk_entry.get(), bias_entry.get(), exs_entry.get(),
+                    timeout_entry.get(), update_console, queue_results if realtime else update_results, realtime, after
+                )
+            finally:
+                finish()  # never leave the GUI stuck in "Already running!"
+
+        threading.Thread(target=work, daemon=True).start()
 
     def clear_console():
         console.config(state="normal")
@@ -462,9 +884,45 @@ def launch_gui():
 
     def clear_all_history():
         clear_history()
-        refresh_history()
+        history_tree.delete(*history_tree.get_children())
         status_bar.config(text="[History cleared]")
 
+    def install_system_deps():
+        install_button.config(state="disabled")
+        status_bar.config(text=f"Installing: {', '.join(missing_system_deps)}...")
+
+        def work():
+            still_missing, errors = list(missing_system_deps), []
+            try:
+                if still_missing:
+                    still_missing, errors = install_system_dependencies(still_missing)
+                if not POPPER_PATH:
+                    check_or_install_popper()
+            except Exception as e:
+                errors.append(f"Installing Popper failed: {e}")
+            after(install_done, still_missing, errors)  # always report back, or the button stays disabled
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def install_done(still_missing, errors):
+        installed = [dep for dep in missing_system_deps if dep not in still_missing]
+        missing_system_deps[:] = still_missing
+        for error in errors:
+            update_console(f"[ERROR] {error}\n", "red")
+        # use_tex is decided once at setup, so a fresh LaTeX install only counts after a restart
+        restart_note = " (restart with --usetex to render with LaTeX)" if "latex" in installed else ""
+        if restart_note:
+            update_console("[INFO] LaTeX installed. Restart with --usetex to render with it.\n", "green")
+        if errors:
+            install_button.config(state="normal")
+            status_bar.config(text=f"⚠ {errors[-1]}")
+        elif still_missing:
+            install_button.config(state="normal")
+            status_bar.config(text=f"⚠ Still missing: {', '.join(still_missing)}{restart_note}")
+        else:
+            install_button.pack_forget()
+            status_bar.config(text=f"✅ System dependencies installed{restart_note}")
+
     def toggle_theme():
         theme = "darkly" if app.style.theme.name == "flatly" else "flatly"
         app.style.theme_use(theme)
@@ -501,6 +959,9 @@ def launch_gui():
     ttk.Button(setting_frame, text="Clear Console", bootstyle="secondary-outline", command=clear_console).pack(side="left")
     ttk.Button(setting_frame, text="Clear History", bootstyle="danger-outline", command=clear_all_history).pack(side="left", padx=5)
     ttk.Button(setting_frame, text="Toggle Theme", bootstyle="info-outline", command=toggle_theme).pack(side="left", padx=10)
+    install_button = ttk.Button(settings_card, text="Install missing system deps", bootstyle="warning-outline", command=install_system_deps)
+    if missing_system_deps:
+        install_button.pack(anchor="w", pady=(10, 0))
 
     progress = ttk.Progressbar(setting_frame, bootstyle="info-striped", mode="indeterminate")
     progress.pack(side="left", padx=10)
@@ -520,13 +981,26 @@ def launch_gui():
 
     history_tab = ttk.Frame(tabs)
     tabs.add(history_tab, text="📜 History")
-    history_box = scrolledtext.ScrolledText(history_tab, height=12, state="disabled")
-    history_box.pack(fill="both", expand=True)
-    refresh_history()
-
-    status_bar = ttk.Label(app, text="Ready", anchor="w", bootstyle="secondary")
+    # ✅ Treeview only lays out visible rows, so appending stays cheap as history grows
+    history_tree = ttk.Treeview(history_tab, columns=("ts", "hyp"), show="headings", height=12)
+    history_tree.heading("ts", text="Timestamp", anchor="w")
+    history_tree.heading("hyp", text="Hypotheses", anchor="w")
+    history_tree.column("ts", width=160, stretch=False)
+    history_tree.column("hyp", width=700)
+    history_scroll = ttk.Scrollbar(history_tab, orient="vertical", command=history_tree.yview)
+    history_tree.configure(yscrollcommand=history_scroll.set)
+    history_scroll.pack(side="right", fill="y")
+    history_tree.pack(fill="both", expand=True)
+    for item in history_store:
+        add_history_row(item)
+
+    status_text = f"⚠ Missing system deps: {', '.join(missing_system_deps)}" if missing_system_deps else "Ready"
+    status_bar = ttk.Label(app, text=status_text, anchor="w", bootstyle="secondary")
     status_bar.pack(fill="x", side="bottom")
     app.mainloop()
+    stop_popper_daemon()  # own session, so closing the window would not reach it or a forked run
+    if history_pending or os.path.exists(HISTORY_LOG_FILE):
+        save_history()
 
 # =======================
 # ✅ CLI OR GUI